@@ -2,12 +2,19 @@
 # EKGStore
 import os
 
-from .parser import Waveform, Metadata
+from ._version import __version_info__
 from .logger import logger
 
 __all__ = ('Waveform', 'Metadata')
 
-__version_info__ = (0, 5, 1)
 __version__ = '.'.join(map(str, __version_info__))
 
 _dir_ = os.path.dirname(__file__)
+
+
+def __getattr__(name):
+  """Import the parsers, and thus numpy and pandas, on first access only."""
+  if name in __all__:
+    from . import parser
+    return getattr(parser, name)
+  raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# Kept apart so that setup.py can read it without importing the package.
+__version_info__ = (0, 5, 1)
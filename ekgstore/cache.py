@@ -0,0 +1,25 @@
+"""Defines the location of files kept between runs."""
+import os
+import tempfile
+
+
+def cache_path(name):
+  """Path of file `name` in the cache directory, which is created if missing.
+
+  The directory is ``$XDG_CACHE_HOME/ekgstore``, that is ``~/.cache/ekgstore``
+  unless the variable is set. If it is not writable, ``ekgstore`` in the
+  temporary directory is used instead.
+
+  Raises:
+      OSError: If neither directory can be created.
+  """
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+  directory = os.path.join(base, 'ekgstore')
+  try:
+    os.makedirs(directory, exist_ok=True)
+  except OSError:
+    directory = None
+  if directory is None or not os.access(directory, os.W_OK):
+    directory = os.path.join(tempfile.gettempdir(), 'ekgstore')
+    os.makedirs(directory, exist_ok=True)
+  return os.path.join(directory, name)
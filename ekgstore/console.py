@@ -2,17 +2,18 @@
 """Defines the console app commands."""
 import click
 import datetime
-import glob2 as glob
+import glob
+import json
+import multiprocessing
 import os
 import sys
 import time
 
-from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from . import logger, __version__, _dir_, inkscape
-from .logger import (error_log_name, summary_log_name, file_log_name,
-    attach_file_loggers)
-from .parser import process_stack
+from .cache import cache_path
+from .logger import log_names, attach_file_loggers, attach_queue_logger, listen
 
 
 def process_pdf(file_name, output_dir, *arg, **kwa):
@@ -25,19 +26,41 @@ def process_pdf(file_name, output_dir, *arg, **kwa):
   Notes:
   - Additional arguments are passed on to `stack_processing`.
   - This method supresses any exception raised by `stack_processing`.
+  - Files without a PDF header are rejected before invoking Inkscape.
   """
+  from .parser import process_stack
   try:
-    logger.debug('--> Begin: {0}'.format(file_name))
+    logger.debug('--> Begin: %s', file_name)
+    if not inkscape.is_pdf(file_name):
+      logger.error('"%s","%s"', file_name, 'Not a PDF file.')
+      return False
     process_stack(file_name, output_dir, *arg, **kwa)
     logger.debug('----> Done')
     return True
   except Exception as e:
     exc = sys.exc_info()
-    logger.error('"{0}","{1}"'.format(file_name, exc[1]))
+    logger.error('"%s","%s"', file_name, exc[1])
     logger.debug('------> Stack Trace:', exc_info=exc)
 
 
-def warmup():
+def init_worker(log_queue):
+  """Prepare a pool worker to process files.
+
+  The worker sends its log records to `log_queue`, to be written by the parent
+  process, and converts its files with its own Inkscape shell.
+  """
+  attach_queue_logger(logger, log_queue)
+  inkscape.use_shell()
+
+
+def calibrate():
+  """Time the conversion of a typical example file, and return 3x of that."""
+  tick = time.time()
+  inkscape.convert(f'{_dir_}/dat/test2_pass.pdf', '/dev/null')
+  return (time.time() - tick) * 3
+
+
+def warmup(max_age=30 * 24 * 3600):
   """Verify integrity of Inkscape application and discover runtime parameters.
 
   Since the time taken to convert a pdf to svg is dictated by Inkscape, this
@@ -47,14 +70,35 @@ def warmup():
   discovered earlier. This gives us an acceptable safeguard against various
   many pdf files that this tool isn't supposed to act upon, but is accidentally
   supplied.
+
+  The conversion is done with the Inkscape shell that is reused for the rest
+  of the files processed in this process.
+
+  The timeout is stored in the cache directory, and reused by the later runs
+  for `max_age` seconds, as long as the Inkscape version stays the same.
   """
   logger.info('==> Warming-up')
-  logger.info('----> Inkscape Version: {0}'.format(inkscape.version()))
+  version = inkscape.version()
+  logger.info('----> Inkscape Version: %s', version)
+  inkscape.use_shell()
+
+  try:
+    with open(cache_path('timeout.json')) as fl:
+      cached = json.load(fl)
+    if cached['inkscape'] == version and time.time() - cached['ts'] < max_age:
+      logger.info('----> Conversion timeout (3x, cached): %s', cached['elapsed'])
+      return cached['elapsed']
+  except (EnvironmentError, ValueError, KeyError, TypeError):
+    pass
+
   logger.info('----> Calibrating runtime...')
-  tick = time.time()
-  inkscape.convert('{0}/dat/test2_pass.pdf'.format(_dir_), '/dev/null')
-  elapsed = (time.time() - tick) * 3
-  logger.info('----> Conversion timeout (3x): {0}'.format(str(elapsed)))
+  elapsed = calibrate()
+  logger.info('----> Conversion timeout (3x): %s', elapsed)
+  try:
+    with open(cache_path('timeout.json'), 'w') as fl:
+      json.dump({'inkscape': version, 'elapsed': elapsed, 'ts': time.time()}, fl)
+  except EnvironmentError:
+    logger.debug('----> Could not store the conversion timeout.')
   return elapsed
 
 
@@ -71,7 +115,12 @@ def warmup():
 @click.option('-x', '--no-logging',
     is_flag=True,
     help='Do not write any log files.')
-def ekg_routine(input, output, no_logging):
+@click.option('-w', '--workers',
+    default=min(os.cpu_count() or 1, 4),
+    type=click.IntRange(1),
+    metavar='<n>',
+    help='Number of files to process in parallel.')
+def ekg_routine(input, output, no_logging, workers):
   """Parse and extract metadata and waveforms from ECG files.
 
   As default behaviour, this tool will find all the files in current directory
@@ -101,6 +150,10 @@ def ekg_routine(input, output, no_logging):
   5. Specify output directory:
       $ ekgstore -o path/to/directory
 
+  \b
+  6. Process eight files at a time:
+      $ ekgstore -w 8
+
   \b
   Notes:
   - Multiple input files are acceptable. The arguments can either be directory
@@ -109,62 +162,86 @@ def ekg_routine(input, output, no_logging):
   - To supply multiple files, simply chain them.
   - '/*.pdf' is appended to the input patterns if they do not end with '.pdf'.
   - Glob patterns MUST be wrapped within single quotes (').
+  - Files matched by more than one input are processed only once.
+  - Files are processed in parallel by "-w" (or "--workers") processes, which
+    defaults to the number of CPUs (at most 4).
 
   """
+  from tqdm import tqdm
   if not no_logging:
     attach_file_loggers(logger)
-  pdfs = []
+  # Same as `os.path.abspath`, without a `getcwd` call for every match.
+  cwd = os.getcwd()
+  pdfs = set()
   for pattern in input:
     if not pattern.endswith('.pdf'):
       pattern += '/*.pdf'
-    for path in glob.glob(pattern):
+    for path in glob.iglob(pattern, recursive=True):
       if path.endswith('.pdf'):
-        pdfs.append(os.path.abspath(path))
+        pdfs.add(os.path.normpath(os.path.join(cwd, path)))
+  pdfs = sorted(pdfs)
   output_dir = os.path.abspath(output)
 
   total_files_to_process = len(pdfs)
   begin = datetime.datetime.now()
 
-  logger.info('==> EKGStore v{0}'.format(__version__))
+  logger.info('==> EKGStore v%s', __version__)
 
   timeout = warmup()
 
-  logger.info('--> Began at {0}'.format(begin.strftime('%b/%d/%Y %I:%M:%S %p')))
-  logger.info('--> Discovered {0} PDF files'.format(total_files_to_process))
+  logger.info('--> Began at %s', begin.strftime('%b/%d/%Y %I:%M:%S %p'))
+  logger.info('--> Discovered %s PDF files', total_files_to_process)
 
   if os.path.exists(output_dir):
     if not os.path.isdir(output_dir):
-      logger.error('--> "{0}" is not a directory.'.format(out_dir))
+      logger.error('--> "%s" is not a directory.', output_dir)
       raise click.Abort
   else:
     try:
       os.makedirs(output_dir)
     except OSError:
-      logger.error('--> Path "{0}" is not accessible.'.format(out_dir))
+      logger.error('--> Path "%s" is not accessible.', output_dir)
       raise click.Abort
 
   success, fail = 0, 0
 
-  for pdf in tqdm(pdfs, desc='--> Processed', unit='files'):
-    if process_pdf(pdf, output_dir, timeout=timeout):
-      success += 1
-    else:
-      fail += 1
+  log_queue = multiprocessing.Queue()
+  listener = listen(logger, log_queue)
+  pool = ProcessPoolExecutor(
+      max_workers=workers,
+      initializer=init_worker,
+      initargs=(log_queue,))
+
+  try:
+    with pool:
+      futures = [pool.submit(process_pdf, pdf, output_dir, timeout=timeout)
+          for pdf in pdfs]
+      progress = tqdm(as_completed(futures), total=len(futures),
+          desc='--> Processed', unit='files')
+      for future in progress:
+        if future.result():
+          success += 1
+        else:
+          fail += 1
+  finally:
+    # The workers have exited, so all their records are in the queue by now.
+    listener.stop()
 
   end = datetime.datetime.now()
   elapsed = (end - begin).total_seconds()
 
   logger.info('==> Summary:')
-  logger.info('----> Suceeded    {0}\tfiles'.format(str(success)))
-  logger.info('----> Errored     {0}\tfiles'.format(str(fail)))
-  logger.info('----> Total       {0}\tfiles'.format(str(len(pdfs))))
-  logger.info('----> Output dir  {0}'.format(output_dir))
-  logger.info('----> Elapsed     {0} seconds'.format(str(elapsed)))
+  logger.info('----> Suceeded    %s\tfiles', success)
+  logger.info('----> Errored     %s\tfiles', fail)
+  logger.info('----> Total       %s\tfiles', len(pdfs))
+  logger.info('----> Output dir  %s', output_dir)
+  logger.info('----> Elapsed     %s seconds', elapsed)
 
   if not no_logging:
+    file_log_name, summary_log_name, error_log_name = log_names()
     logger.info('==> Log Files:')
-    logger.info('----> Summary     {0}'.format(summary_log_name))
-    logger.info('----> Errors      {0}'.format(error_log_name))
-    logger.info('----> Complete    {0}\n\n'.format(file_log_name))
+    logger.info('----> Summary     %s', summary_log_name)
+    logger.info('----> Errors      %s', error_log_name)
+    logger.info('----> Complete    %s\n\n', file_log_name)
   else:
     logger.info('==> Log Files not written.')
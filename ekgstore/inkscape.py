@@ -1,12 +1,25 @@
 """Wrapper around Inkscape commandline app."""
+import atexit
+import collections
+import contextlib
+import functools
+import itertools
 import os
 import re
-import sys
+import selectors
+import shlex
+import subprocess
+import time
 
-if os.name == 'posix' and sys.version_info[0] < 3:
-  import subprocess32 as subprocess
-else:
-  import subprocess
+_CAMEL_RE = re.compile('([A-Z]+)')
+# Shell used by ``convert`` in this process, see ``use_shell``.
+_shell = None
+
+
+@functools.lru_cache(maxsize=128)
+def _cli_key(key):
+  """Translate a keyword to option name, e.g. ``withoutGui`` => ``without-gui``."""
+  return _CAMEL_RE.sub(r'-\1', key).lower()
 
 
 def get_args(**kwa):
@@ -27,30 +40,50 @@ def get_args(**kwa):
   args = ['inkscape']
 
   for key, value in kwa.items():
-    key = re.sub('([A-Z]+)', r'-\1', key).lower()
+    key = _cli_key(key)
 
     if value and type(value) is not bool:
-      args.append('--{0}={1}'.format(key, value))
+      args.append(f'--{key}={value}')
     elif value:
-      args.append('--{0}'.format(key))
+      args.append(f'--{key}')
 
   assert len(args) > 1, 'No arguments supplied.'
   return args
 
 
-def passthru(timeout=None, **kwa):
+def is_pdf(file_name):
+  """Check for the PDF header signature, without parsing the file.
+
+  Like most readers, we accept the header anywhere in the first kilobyte.
+  """
+  with open(file_name, 'rb') as fl:
+    return b'%PDF-' in fl.read(1024)
+
+
+def passthru(timeout=None, capture=True, **kwa):
   """Spawn Inkscape subprocess.
 
   Args:
       timeout (float, optional): If supplied, the subprocess is killed after
           the timeout period.
+      capture (bool): Return the output of Inkscape. Otherwise its stdout and
+          stderr are discarded without being read by Python.
       Additional arguments are passed on to ``get_args``.
 
+  Returns:
+      bytes: Output of Inkscape, or ``None`` if ``capture`` is false.
+
   Raises:
       RuntimeError: For any exception with subprocess.
   """
+  output = subprocess.PIPE if capture else subprocess.DEVNULL
+  errors = None if capture else subprocess.DEVNULL
   try:
-    return subprocess.check_output(get_args(**kwa), timeout=timeout)
+    return subprocess.run(get_args(**kwa),
+        stdout=output,
+        stderr=errors,
+        timeout=timeout,
+        check=True).stdout
   except EnvironmentError:
     raise RuntimeError('`inkscape` binary is required.')
   except subprocess.CalledProcessError:
@@ -59,25 +92,210 @@ def passthru(timeout=None, **kwa):
     raise RuntimeError('Operation timed out.')
 
 
+@functools.lru_cache(maxsize=1)
 def version():
-  """Find the version of inkscape binary."""
+  """Find the version of inkscape binary. The result is cached."""
   out = passthru(version=True)
   vinfo = out.decode()
   assert vinfo.startswith('Inkscape'), 'Unknown Inkscape version.'
   return vinfo[9:14]
 
 
-def convert(location, destination, timeout=None):
+class InkscapeShell(object):
+  """Persistent Inkscape process running in ``--shell`` mode.
+
+  Starting Inkscape takes much longer than converting a typical EKG file. In
+  shell mode Inkscape reads one set of commandline arguments per line from
+  stdin and prints a ``>`` prompt when it is ready for the next, so a single
+  process can convert any number of files.
+
+  The process is spawned on first use, and spawned again if the previous one
+  had to be killed or if the shell was inherited by a forked process.
+  """
+  # Some versions follow the prompt with a space, which is skipped.
+  prompt = b'>'
+
+  def __init__(self):
+    self._proc = None
+    self._pid = None
+    self._selector = None
+    self._buffer = b''
+
+  def _spawn_(self, timeout=None):
+    """Start Inkscape and wait up to ``timeout`` seconds for its first prompt."""
+    try:
+      self._proc = subprocess.Popen(['inkscape', '--shell'],
+          stdin=subprocess.PIPE,
+          stdout=subprocess.PIPE,
+          stderr=subprocess.DEVNULL)
+    except EnvironmentError:
+      raise RuntimeError('`inkscape` binary is required.')
+    self._pid = os.getpid()
+    self._buffer = b''
+    self._selector = selectors.DefaultSelector()
+    self._selector.register(self._proc.stdout, selectors.EVENT_READ)
+    self._read_prompt_(timeout)
+
+  def _ensure_(self, timeout=None):
+    """Spawn the process unless a usable one is running."""
+    if self._proc is not None and self._pid == os.getpid() and self._proc.poll() is not None:
+      # Exited on its own, e.g. crashed on the previous file.
+      self.close()
+    if self._proc is None or self._pid != os.getpid():
+      self._spawn_(timeout)
+
+  def _read_prompt_(self, timeout=None):
+    """Read the shell output until Inkscape prompts for the next command.
+
+    Inkscape is waiting for a command once its output ends with the prompt.
+    With several commands in flight a single read may contain more than one
+    prompt, so anything after the first prompt is kept for the next call.
+
+    Raises:
+        RuntimeError: If the prompt does not appear within ``timeout`` seconds
+            or the process exits. The process is killed in either case.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    stdout = self._proc.stdout.fileno()
+    while not self._buffer.rstrip().endswith(self.prompt):
+      wait = None if deadline is None else max(deadline - time.time(), 0)
+      if not self._selector.select(wait):
+        self.close()
+        raise RuntimeError('Operation timed out.')
+      chunk = os.read(stdout, 4096)
+      if not chunk:
+        self.close()
+        raise RuntimeError('Operation failed.')
+      self._buffer += chunk
+    out, _, rest = self._buffer.partition(self.prompt)
+    self._buffer = rest.lstrip(b' ')
+    return out
+
+  def _send_(self, location, destination):
+    """Queue a conversion command without waiting for it to finish.
+
+    Raises:
+        RuntimeError: If the process has exited. It is not closed here, so that
+            the prompts it printed before can still be read.
+    """
+    args = get_args(file=location, exportPlainSvg=destination)[1:]
+    command = ' '.join(map(shlex.quote, args)) + '\n'
+    try:
+      self._proc.stdin.write(command.encode())
+      self._proc.stdin.flush()
+    except OSError:
+      raise RuntimeError('Operation failed.')
+
+  def convert(self, location, destination, timeout=None):
+    """Convert PDF to SVG. Arguments are same as ``convert``."""
+    self._ensure_(timeout)
+    try:
+      self._send_(location, destination)
+    except RuntimeError:
+      self.close()
+      raise
+    self._read_prompt_(timeout)
+    if not os.path.exists(destination):
+      raise RuntimeError('Operation failed.')
+
+  def convert_many(self, jobs, window=2, timeout=None):
+    """Convert several files, keeping up to ``window`` commands queued.
+
+    Inkscape starts on the next command as soon as it is done with the
+    current one, instead of idling until the caller sends it.
+
+    Args:
+        jobs (iterable): ``(location, destination)`` pairs.
+        window (int): Maximum number of outstanding commands.
+        timeout (float): Seconds to wait for each conversion.
+
+    Returns:
+        generator: ``(location, destination, error)`` tuples in the order of
+            ``jobs``, where ``error`` is ``None`` or a ``RuntimeError``.
+    """
+    jobs = iter(jobs)
+    pending = collections.deque()
+    while True:
+      for job in itertools.islice(jobs, max(window - len(pending), 0)):
+        if pending and self._proc.poll() is not None:
+          # Not spawned again until the prompts of the queued commands are
+          # read, or they would be mixed up with those of the new process.
+          jobs = itertools.chain([job], jobs)
+          break
+        self._ensure_(timeout)
+        try:
+          self._send_(*job)
+        except RuntimeError as exc:
+          if pending:
+            # The process died on a queued command, which the reads below
+            # find out. This one is sent again after that.
+            jobs = itertools.chain([job], jobs)
+            break
+          self.close()
+          yield job[0], job[1], exc
+          continue
+        pending.append(job)
+      if not pending:
+        return
+      location, destination = pending.popleft()
+      try:
+        self._read_prompt_(timeout)
+        error = None if os.path.exists(destination) else RuntimeError('Operation failed.')
+      except RuntimeError as exc:
+        error = exc
+        # Queued commands died with the process, send them again.
+        jobs = itertools.chain(list(pending), jobs)
+        pending.clear()
+      yield location, destination, error
+
+  def close(self):
+    """Terminate the Inkscape process, if it belongs to this process."""
+    if self._proc is not None and self._pid == os.getpid():
+      self._proc.kill()
+      self._proc.wait()
+      self._selector.close()
+    self._proc = None
+    self._selector = None
+    self._buffer = b''
+
+
+def use_shell():
+  """Make ``convert`` reuse a single Inkscape shell in the current process."""
+  global _shell
+  if _shell is None:
+    _shell = InkscapeShell()
+    atexit.register(_shell.close)
+  return _shell
+
+
+@contextlib.contextmanager
+def shell():
+  """Context manager yielding an ``InkscapeShell`` that is closed on exit."""
+  sh = InkscapeShell()
+  try:
+    yield sh
+  finally:
+    sh.close()
+
+
+def convert(location, destination, timeout=None, shell=None):
   """Convert PDF to SVG.
 
+  The conversion is done by ``shell`` if given, or by the shell started with
+  ``use_shell`` if there is one, otherwise a new Inkscape process is spawned.
+
   Args:
       location (str): Path of PDF file.
       destination (str): Path where to write SVG.
       timeout (Optional[float]): Operation timeout value.
+      shell (Optional[InkscapeShell]): Shell to run the conversion in.
   """
-  return passthru(
+  shell = shell or _shell
+  if shell is not None:
+    return shell.convert(location, destination, timeout)
+  passthru(
       file=location,
       exportPlainSvg=destination,
       withoutGui=True,
-      timeout=timeout)
-
+      timeout=timeout,
+      capture=False)
@@ -1,9 +1,12 @@
 """Defines logging files and parameters."""
+import atexit
 import datetime
+import functools
 import logging
 import os
 
 from logging import StreamHandler, FileHandler
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 
 
 class InfoLevelFilter(logging.Filter):
@@ -31,14 +34,50 @@ console_handle.setFormatter(console_log_format)
 console_handle.addFilter(InfoLevelFilter())
 console_handle.setLevel(logging.INFO)
 
-dtformat = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-file_log_name = '{0}/EKG_Extraction_{1}.log'.format(os.getcwd(), dtformat)
-summary_log_name = '{0}/EKG_Run_Summary.txt'.format(os.getcwd())
-error_log_name = '{0}/EKG_Extraction_Errors_{1}.csv'.format(os.getcwd(), dtformat)
+_log_name_keys = ('file_log_name', 'summary_log_name', 'error_log_name')
+
+
+@functools.lru_cache(maxsize=1)
+def log_names():
+  """Paths of the log, summary and error files of this run.
+
+  The names are made on first use rather than on import, so that processes
+  which only import the module (such as workers) skip it, and the timestamp
+  is that of the run.
+  """
+  dtformat = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+  cwd = os.getcwd()
+  return (
+      f'{cwd}/EKG_Extraction_{dtformat}.log',
+      f'{cwd}/EKG_Run_Summary.txt',
+      f'{cwd}/EKG_Extraction_Errors_{dtformat}.csv')
+
+
+def __getattr__(name):
+  """Keep `file_log_name` and friends available as module attributes."""
+  if name in _log_name_keys:
+    return log_names()[_log_name_keys.index(name)]
+  raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def buffered(handle, capacity=1000):
+  """Wrap `handle` to write the records in batches.
+
+  Records are held in memory until `capacity` of them are collected, or an
+  `ERROR` record arrives, so that the errors are on disk right away.
+  """
+  buffer_handle = MemoryHandler(capacity,
+      flushLevel=logging.ERROR,
+      target=handle)
+  # Records are passed on to `handle` without checking its level.
+  buffer_handle.setLevel(handle.level)
+  atexit.register(buffer_handle.flush)
+  return buffer_handle
 
 
 def attach_file_loggers(logger):
   """Initialize log files to `logger`."""
+  file_log_name, summary_log_name, error_log_name = log_names()
   file_handle = FileHandler(file_log_name)
   file_handle.setFormatter(file_log_format)
   file_handle.setLevel(logging.DEBUG)
@@ -53,9 +92,33 @@ def attach_file_loggers(logger):
   error_log_handle.setLevel(logging.DEBUG)
   error_log_handle.addFilter(ErrorLevelFilter())
 
-  logger.addHandler(file_handle)
-  logger.addHandler(summary_log_handle)
-  logger.addHandler(error_log_handle)
+  logger.addHandler(buffered(file_handle))
+  logger.addHandler(buffered(summary_log_handle))
+  logger.addHandler(buffered(error_log_handle))
+
+
+def attach_queue_logger(logger, queue):
+  """Replace the handlers of `logger` with one that sends records to `queue`.
+
+  This is used in worker processes, whose records are then written by a
+  single listener in the parent process (see `listen`), instead of several
+  processes writing to the same log files.
+  """
+  for handle in list(logger.handlers):
+    logger.removeHandler(handle)
+  logger.addHandler(QueueHandler(queue))
+
+
+def listen(logger, queue):
+  """Handle the records sent to `queue` with the handlers of `logger`.
+
+  Returns the started `QueueListener`. Stopping it handles the records that
+  are still in the queue.
+  """
+  listener = QueueListener(queue, *logger.handlers,
+      respect_handler_level=True)
+  listener.start()
+  return listener
 
 
 logger = logging.getLogger(__name__)
@@ -1,20 +1,145 @@
 # -*- coding: utf-8 -*-
 """Defines parsing methods and processing routines."""
-from __future__ import division
-import ast
 import contextlib
+import functools
 import hashlib
 import json
+import multiprocessing
 import numpy as np
 import os
 import pandas as pd
 import re
 
 from codecs import open
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
 from pyquery import PyQuery as pq
 
 from . import inkscape
-from .logger import logger
+from .cache import cache_path
+from .logger import attach_queue_logger, listen, logger
+
+# Relative paths made of horizontal and vertical lines only, e.g. grids.
+_STRAIGHT_PATH_RE = re.compile(r'm -?[\d\.]+,-?[\d\.]+ (-?[\d\.]+,0 ?|0,-?[\d\.]+ ?)+z?$')
+# Anything but numbers and separators, i.e. path commands.
+_PATH_COMMAND_RE = re.compile(r'[^\d\s,.eE+-]')
+# First coordinate of a relative path.
+_OFFSET_RE = re.compile(r'm (-?[\d\.]+,-?[\d\.]+)')
+# Translation is the last two values of matrix(a,b,c,d,e,f).
+_TRANSFORM_RE = re.compile(r'matrix\(([^)]+)\)')
+_SCALE_RE = re.compile(r'(\d+)')
+_KEY_JUNK_RE = re.compile(r'[^\w\d\s\-_\\]+')
+
+try:
+  import numba
+except ImportError:
+  numba = None
+
+try:
+  import svgelements
+except ImportError:
+  svgelements = None
+
+
+def njit(*arg, **kwa):
+  """Compile the decorated function with ``numba.njit`` if numba is available.
+
+  Without numba the function is left as is, hence the decorated functions are
+  written using the NumPy operations that numba supports.
+  """
+  if numba is None:
+    return lambda fn: fn
+  return numba.njit(*arg, **kwa)
+
+
+@njit(cache=True)
+def _parse_steps_(buf):
+  """Numbers of a path made of numbers and separators only, as in ``m`` paths.
+
+  This is a specialised ``np.fromstring`` for the bytes of such a path, which
+  is only used when it is compiled with numba. Digits are accumulated into the
+  mantissa and scaled by the power of ten once per number. The bytes are
+  converted to ``int`` before any arithmetic, so that the plain Python form
+  does not wrap around in ``uint8`` either.
+
+  Args:
+      buf (np.ndarray): ``uint8`` array of the path, without its command.
+  """
+  size = buf.size
+  out = np.empty(size // 2 + 1, dtype=np.float64)
+  n = 0
+  i = 0
+  while i < size:
+    c = buf[i]
+    # Whitespace and commas separate the numbers.
+    if c == 32 or c == 44 or 9 <= c <= 13:
+      i += 1
+      continue
+    negative = c == 45
+    if c == 45 or c == 43:
+      i += 1
+    mantissa = 0.0
+    exponent = 0
+    while i < size and 48 <= buf[i] <= 57:
+      mantissa = mantissa * 10 + (int(buf[i]) - 48)
+      i += 1
+    if i < size and buf[i] == 46:
+      i += 1
+      while i < size and 48 <= buf[i] <= 57:
+        mantissa = mantissa * 10 + (int(buf[i]) - 48)
+        exponent -= 1
+        i += 1
+    if i < size and (buf[i] == 101 or buf[i] == 69):
+      i += 1
+      negative_exp = i < size and buf[i] == 45
+      if i < size and (buf[i] == 45 or buf[i] == 43):
+        i += 1
+      power = 0
+      while i < size and 48 <= buf[i] <= 57:
+        power = power * 10 + (int(buf[i]) - 48)
+        i += 1
+      exponent += -power if negative_exp else power
+    if exponent < 0:
+      mantissa /= 10.0 ** -exponent
+    elif exponent > 0:
+      mantissa *= 10.0 ** exponent
+    out[n] = -mantissa if negative else mantissa
+    n += 1
+  return out[:n]
+
+
+@njit(cache=True, fastmath=True)
+def _waveform_kernel_(coords, anchors):
+  """Move absolute ``coords`` to the anchors closest to them, in place.
+
+  For each axis the anchor closest to the mean of the coordinates is
+  subtracted, which is the same as subtracting it from the first step before
+  the cumulative sum.
+
+  Args:
+      coords (np.ndarray): ``(n, 2)`` array of ``x`` and ``y`` coordinates.
+      anchors (np.ndarray): ``(n, 2)`` array of candidate offsets.
+  """
+  x_closest = np.abs(coords[:, 0].mean() - anchors[:, 0]).argmin()
+  y_closest = np.abs(coords[:, 1].mean() - anchors[:, 1]).argmin()
+  coords[:, 0] -= anchors[x_closest, 0]
+  coords[:, 1] -= anchors[y_closest, 1]
+  return coords
+
+
+class BatchError(RuntimeError):
+  """Raised by ``Parser.process_many`` once all files ran, if any of them failed.
+
+  Attributes:
+      errors (dict): Exception raised by each failed file, by file name.
+      results (Optional[list]): Results in the order of the files, ``None`` for
+          the failed ones, if the batch has results.
+  """
+
+  def __init__(self, errors, results=None):
+    super().__init__(f'{len(errors)} file(s) failed: {", ".join(errors)}')
+    self.errors = errors
+    self.results = results
 
 
 class Parser(object):
@@ -54,60 +179,115 @@ class Parser(object):
       file (str): Path to the PDF file.
       timeout (Optional[float]): Specify an optional timeout which is supplied
           to Inkscape.
+      shell (Optional[inkscape.InkscapeShell]): Inkscape shell to convert the
+          PDF with, see ``process_many``.
   """
-  def __init__(self, file, timeout=None, *arg, **kwa):
+  _XPATH_ALL_PATHS = etree.XPath('.//path')
+
+  def __init__(self, file, timeout=None, shell=None, *arg, **kwa):
     self._pdf_file_path_ = os.path.abspath(file)
     self._timeout = timeout
+    self._shell = shell
+    self._svg = None
 
   def _make_svg_(self):
     """Convert the pdf to svg file if necessary and initialize parser.
 
-    To obtain the SVG, we find the md5 hash of the PDF file's path. This allows
-    us to uniquely refer the files in a temporary location (``/tmp``) without
-    any conflicts due to similar file names or very long paths.
+    To obtain the SVG, we find the hash of the PDF file's contents. This allows
+    us to uniquely refer the files in the cache directory without any conflicts
+    due to similar file names or very long paths, and a file that changed is
+    converted again while a renamed or copied one is not.
 
-    If the svg file already exist at ``/tmp`` (because it was previously
+    If the svg file already exist in the cache (because it was previously
     converted) then we do not bother converting it yet again and simply proceed
     to parsing.
 
     This method uses the ``inkscape`` wrapper to convert the pdf files to svg.
-    The svg file is processed by XML parsing utility called ``PyQuery``.
+    The svg file is parsed with ``lxml`` and wrapped in ``PyQuery`` after the
+    namespaces are removed from the tags.
     """
-    svg_hash = hashlib.md5(self._pdf_file_path_.encode()).hexdigest()
-    svg_path = '/tmp/{0}.svg'.format(svg_hash)
+    svg_path = self._svg_path_(self._pdf_file_path_)
 
     if not os.path.exists(svg_path):
-      inkscape.convert(
-          location=self._pdf_file_path_,
-          destination=svg_path,
-          timeout=self._timeout)
-
-    with open(svg_path, 'r', encoding='utf-8') as fl:
-      content = fl.read().encode(encoding='utf-8')
-      self._svg = pq(content)
-      self._svg.remove_namespaces()
-      self._strip_elements_()
-
-  def _strip_elements_(self):
+      partial = self._partial_path_(svg_path)
+      try:
+        inkscape.convert(
+            location=self._pdf_file_path_,
+            destination=partial,
+            timeout=self._timeout,
+            shell=self._shell)
+        os.replace(partial, svg_path)
+      finally:
+        with supress(OSError):
+          os.remove(partial)
+
+    self._svg = self._load_svg_(svg_path)
+
+  @staticmethod
+  def _svg_path_(pdf_path):
+    """Path of the cached SVG of the PDF file, named by its content hash.
+
+    The whole file is hashed, along with its size. Hashing is cheap next to a
+    conversion, and the cached SVGs are kept across runs, so two files must
+    never share a name.
+    """
+    digest = hashlib.blake2b(str(os.path.getsize(pdf_path)).encode(), digest_size=8)
+    with open(pdf_path, 'rb') as fl:
+      for chunk in iter(lambda: fl.read(1 << 16), b''):
+        digest.update(chunk)
+    return cache_path(f'{digest.hexdigest()}.svg')
+
+  @staticmethod
+  def _partial_path_(svg_path):
+    """Path that Inkscape writes ``svg_path`` to in this process.
+
+    The file is moved to ``svg_path`` once complete, so that other processes
+    never find a partially written SVG in the cache.
+    """
+    return f'{svg_path[:-4]}.{os.getpid()}.part.svg'
+
+  @staticmethod
+  @functools.lru_cache(maxsize=1)
+  def _load_svg_(svg_path):
+    """Parse the SVG file and strip the elements we do not need from it.
+
+    The last tree is kept so that the ``Waveform`` and ``Metadata`` parsers of
+    a file share it, rather than parse and strip the same SVG twice. Parsers
+    only read the tree, and must not modify it.
+    """
+    # Parsed straight from the file by libxml2. Parsers are not shared as they
+    # are not thread safe.
+    tree = etree.parse(svg_path, etree.XMLParser(huge_tree=True))
+    for el in tree.iter('{*}*'):
+      el.tag = etree.QName(el).localname
+    etree.cleanup_namespaces(tree)
+    Parser._strip_elements_(tree.getroot())
+    return pq(tree.getroot())
+
+  @staticmethod
+  def _strip_elements_(root):
     """Remove unnecessary path elements from SVG tree.
 
     Since the SVG contained many elements which we do not need (such as grids),
     we can remove those elements to make parsing convenient.
     """
-    # Remove svg definitions from the tree
-    (self.svg
-        .find('defs')
-        .remove())
-    # Remove paths which are composed of straight lines
-    path_pattern = r'm -?[\d\.]+,-?[\d\.]+ (-?[\d\.]+,0 ?|0,-?[\d\.]+ ?)+z?$'
-    (self.svg
-        .find('path')
-        .filter(lambda: re.match(path_pattern, pq(this).attr('d')) is not None)
-        .remove())
-    # Remove all groups without any children nodes.
-    (self.svg
-        .find('g:empty')
-        .remove())
+    # One pass over the tree in reverse document order, so that the children
+    # of an element are seen before it. Groups are emptied of the elements
+    # removed below first, and only then tested for remaining children.
+    empty_groups = []
+    for el in reversed(list(root.iter('defs', 'path', 'g'))):
+      if el.tag == 'defs':
+        # Remove svg definitions from the tree
+        _remove_(el)
+      elif el.tag == 'path':
+        # Remove paths which are composed of straight lines
+        if _STRAIGHT_PATH_RE.match(el.get('d', '')) is not None:
+          _remove_(el)
+      elif len(el) == 0 and not el.text:
+        # Remove all groups without any children nodes.
+        empty_groups.append(el)
+    for el in reversed(empty_groups):
+      _remove_(el)
 
   def export(self):
     """Parser subclasses can implement this method to generate the result."""
@@ -116,7 +296,7 @@ class Parser(object):
   @property
   def svg(self):
     """Convenience property to obtain the SVG instance."""
-    if not hasattr(self, '_svg'):
+    if self._svg is None:
       self._make_svg_()
     return self._svg
 
@@ -126,6 +306,108 @@ class Parser(object):
     obj = cls(flname, *arg, **kwa)
     return obj.export()
 
+  @classmethod
+  def _process_batch_(cls, flnames, *arg, **kwa):
+    """Process files one after another, converting them in one Inkscape shell.
+
+    The files that are not in the cache are queued to the shell up front, so
+    that Inkscape converts the next file while the current one is parsed. The
+    shell is not handed to ``process``, as its output belongs to the queued
+    commands.
+
+    A file that fails does not stop the batch. Its error, or the conversion
+    error reported by the shell, is kept by file name.
+
+    Returns:
+        tuple: Results in the order of ``flnames``, ``None`` for the failed
+            files, and a dict of the errors of the failed files.
+    """
+    jobs = {}
+    failed = {}
+    for flname in flnames:
+      location = os.path.abspath(flname)
+      try:
+        if not inkscape.is_pdf(location):
+          raise RuntimeError('Not a PDF file.')
+        svg_path = cls._svg_path_(location)
+      except (OSError, RuntimeError) as exc:
+        # Reported when the batch reaches the file, without converting it.
+        failed[location] = exc
+        continue
+      if not os.path.exists(svg_path):
+        jobs[location] = svg_path
+
+    results = []
+    errors = {}
+    with inkscape.shell() as shell:
+      converted = shell.convert_many(
+          [(location, cls._partial_path_(svg_path)) for location, svg_path in jobs.items()],
+          timeout=kwa.get('timeout'))
+      for flname in flnames:
+        location = os.path.abspath(flname)
+        while location in jobs:
+          done, partial, error = next(converted)
+          with supress(OSError):
+            if error is None:
+              os.replace(partial, jobs[done])
+            else:
+              failed[done] = error
+              os.remove(partial)
+          del jobs[done]
+        try:
+          if location in failed:
+            raise failed[location]
+          results.append(cls.process(flname, *arg, **kwa))
+        except Exception as exc:
+          logger.error('"%s","%s"', flname, exc)
+          errors[flname] = exc
+          results.append(None)
+    return results, errors
+
+  @classmethod
+  def process_many(cls, flnames, *arg, workers=None, **kwa):
+    """Process several files in parallel.
+
+    The files are split between ``workers`` processes and each of them runs a
+    single Inkscape shell for its share. Starting Inkscape usually takes longer
+    than the conversion itself, so it is started once per worker rather than
+    once per file. Files without a PDF header are not converted.
+
+    Args:
+        flnames (list): Paths to the PDF files.
+        workers (Optional[int]): Number of processes, defaults to the number of
+            CPUs. With a single worker the files are processed in this process.
+
+    Returns:
+        list: Results of ``process``, in the order of ``flnames``.
+
+    Raises:
+        BatchError: If any of the files failed, once all of them have run.
+    """
+    flnames = list(flnames)
+    workers = min(workers or os.cpu_count() or 1, len(flnames))
+    if workers <= 1:
+      results, errors = cls._process_batch_(flnames, *arg, **kwa)
+    else:
+      results, errors = [None] * len(flnames), {}
+      # The workers send their records to this process, see `console`.
+      log_queue = multiprocessing.Queue()
+      listener = listen(logger, log_queue)
+      try:
+        with ProcessPoolExecutor(max_workers=workers,
+            initializer=attach_queue_logger,
+            initargs=(logger, log_queue)) as pool:
+          futures = [pool.submit(cls._process_batch_, flnames[i::workers], *arg, **kwa)
+              for i in range(workers)]
+          for i, future in enumerate(futures):
+            results[i::workers], share_errors = future.result()
+            errors.update(share_errors)
+      finally:
+        listener.stop()
+    if errors:
+      raise BatchError(errors, results)
+    return results
+
 
 class Waveform(Parser):
   """Extract and Process the Waveforms, labels and Scaling factors.
@@ -140,6 +422,15 @@ class Waveform(Parser):
   It was also discovered that the waveform path elements have their label text
   nodes as a sibling node. All this is coded in the ``get_waves`` method.
   """
+  # Text labels in the group right after a group holding paths.
+  _XPATH_TEXT = etree.XPath('.//path/../following-sibling::*[1][self::g]//text')
+  # Paths in the element right before the parent of a text label.
+  _XPATH_WAVE = etree.XPath(
+      './/path/../following-sibling::*[1][self::g]//text/../preceding-sibling::*[1]//path')
+  _XPATH_TEXT_FALLBACK = etree.XPath('.//path/following-sibling::*[1][self::text]')
+  _XPATH_WAVE_FALLBACK = etree.XPath(
+      './/path/following-sibling::*[1][self::text]/preceding-sibling::*[1]')
+
   def _path_as_waveform_(self, path, offset=None):
     """Parse SVG path to coordinates.
 
@@ -164,29 +455,39 @@ class Waveform(Parser):
     Returns:
         Waveform in absolute coordinates.
 
+    Paths using other commands than ``m``, such as ``h``, ``v`` or absolute
+    ones, are read with ``svgelements`` if it is installed. Only the end points
+    of their segments are used.
+
     Raises:
-        AssertionError: If ``path`` is not a relative SVG path expression.
+        AssertionError: If ``path`` is not a relative SVG path expression and
+            ``svgelements`` is not installed.
+        ValueError: If ``path`` uses other commands than ``m`` and
+            ``svgelements`` is not installed.
     """
     # This parses the SVG path
     assert type(path) is str, 'Expected path to be a string.'
-    assert path[0] is 'm', 'Expected path to be relative SVG.m expression.'
-    path = path[2:]
-    steps = [list(map(float, _.split(','))) for _ in path.split(' ')]
-
-    # [[xi..], [yi..]]
-    steps_pair = list(map(list, zip(*steps)))
-
-    for i in range(2):
-      if offset is not None:
-        axis_approx = np.cumsum(steps_pair[i]).mean()
-        delta_initial = steps_pair[i][0] - offset[:,i]
-        delta_axial = axis_approx - offset[:,i]
-        closest_axis_index = np.abs(delta_axial).argsort()[0]
-        steps_pair[i][0] = delta_initial[closest_axis_index]
+    if path[0] == 'm' and _PATH_COMMAND_RE.search(path, 1) is None:
+      # "m x0,y0 dx1,dy1 ..." => [x0, y0, dx1, dy1, ...], parsed in one go.
+      if numba is not None:
+        steps = _parse_steps_(np.frombuffer(path[1:].encode('ascii'), dtype=np.uint8))
       else:
-        steps_pair[i][0] = 0
-
-    return [np.cumsum(x) for x in steps_pair]
+        steps = np.fromstring(path[2:].replace(',', ' '), sep=' ', dtype=np.float64)
+    elif svgelements is not None:
+      steps = _path_steps_(path)
+    else:
+      assert path[0] == 'm', 'Expected path to be relative SVG.m expression.'
+      raise ValueError('Parsing path commands other than `m` requires svgelements.')
+    assert steps.size % 2 == 0, 'Expected path to contain coordinate pairs.'
+
+    # The steps are summed up in place, the coordinates are views of them.
+    coords = steps.reshape(-1, 2)
+    if offset is None:
+      coords[0] = 0
+    np.cumsum(coords, axis=0, out=coords)
+    if offset is not None:
+      _waveform_kernel_(coords, np.asarray(offset, dtype=np.float64))
+    return [coords[:, 0], coords[:, 1]]
 
   def _get_units_(self, unit_marker):
     """Infer x and y axis units from the calibration markers.
@@ -208,7 +509,7 @@ class Waveform(Parser):
     y_sz = 10.0 / (arr_range(y_steps))
     return x_sz, y_sz
 
-  def _get_offsets_(self, unit_marker):
+  def _get_offsets_(self, unit_markers):
     """Find the first coordinate of the calibration markers.
 
     Since we infer the absolute coordinates of the waveform path from preceeding
@@ -217,11 +518,9 @@ class Waveform(Parser):
     We solve this by using the calibration markers as the absolute and use
     it as the "baseline" zero coordinate.
     """
-    pattern = r'm (-?[\d\.]+,-?[\d\.]+)'
     with supress(AttributeError):
-      markers = (unit_marker
-          .map(lambda: re.match(pattern, pq(this).attr('d')).groups()[0]))
-      return np.array(list(map(ast.literal_eval, markers)))
+      markers = [_OFFSET_RE.match(el.get('d')).groups()[0] for el in unit_markers]
+      return np.array([m.split(',') for m in markers], dtype=np.float64)
 
   def get_waves(self):
     """Find waveforms and markers in the SVG.
@@ -246,50 +545,80 @@ class Waveform(Parser):
     Next, we use the ``_path_as_waveform_`` method with offsets to obtain the
     absolute waveforms, hence solving this problem.
     """
+    root = self.svg[0]
     # we want to look at waves that also have the annotations
-    text_anchor_els = (self.svg
-        .find('path')
-        .parent()
-        .next('g')
-        .find('text'))
+    text_anchor_els = self._XPATH_TEXT(root)
     # Wave elements that we're interested in were in the previous element.
-    waveform_els = (text_anchor_els
-        .parent()
-        .prev()
-        .find('path'))
+    waveform_els = self._XPATH_WAVE(root)
     if not text_anchor_els:
       # Fallback
-      text_anchor_els = (self.svg
-          .find('path')
-          .next('text'))
-      waveform_els = (text_anchor_els.prev())
-
-    node_repr = lambda x: pq(x).__repr__()
-    waveform_repr = waveform_els.map(lambda: node_repr(this))
-    wave_paths = waveform_els.map(lambda: pq(this).attr('d'))
-    unit_markers = (self.svg
-        .find('path')
-        .filter(lambda: node_repr(this) not in waveform_repr))
-    unit_marker = unit_markers.attr('d')
+      text_anchor_els = self._XPATH_TEXT_FALLBACK(root)
+      waveform_els = self._XPATH_WAVE_FALLBACK(root)
+
+    # lxml hands out the same proxy for a node while it is referenced, so the
+    # elements themselves can be used for the membership test.
+    waveform_set = set(waveform_els)
+    unit_markers = [el for el in self._XPATH_ALL_PATHS(root) if el not in waveform_set]
+    unit_marker = unit_markers[0].get('d') if unit_markers else None
 
     offset = self._get_offsets_(unit_markers)
-    labels = text_anchor_els.map(lambda: pq(this).text())
-    waveform = [self._path_as_waveform_(x, offset) for x in wave_paths]
+    labels = [_text_(el) for el in text_anchor_els]
+    waveform = [self._path_as_waveform_(el.get('d'), offset) for el in waveform_els]
     return list(zip(labels, waveform)), self._get_units_(unit_marker)
 
   def export(self):
     """Perform the heuristics to obtain the waveform dataframes and factors."""
     waves, units = self.get_waves()
-    rows = []
-    for label, waveform in waves:
-      for x, y in zip(*waveform):
-        rows.append([label, x, y])
-
     columns = ('lead', 'absoluteX', 'absoluteY')
-    df = pd.DataFrame(rows, columns=columns)
+    if not waves:
+      return pd.DataFrame([], columns=columns), units
+
+    # Leads are stored as categorical codes rather than a string per sample.
+    # The coordinates are accumulated in double precision by
+    # ``_path_as_waveform_`` and then stored in single precision, which is
+    # well beyond the precision of the SVG path and takes half the memory.
+    codes, labels = pd.factorize(np.array([label for label, _ in waves], dtype=object))
+    sizes = [len(x) for _, (x, _) in waves]
+    df = pd.DataFrame({
+        'lead': pd.Categorical.from_codes(np.repeat(codes, sizes), labels),
+        'absoluteX': np.concatenate([x for _, (x, _) in waves]).astype(np.float32),
+        'absoluteY': np.concatenate([y for _, (_, y) in waves]).astype(np.float32),
+    }, columns=columns)
     return df, units
 
 
+def _path_steps_(path):
+  """Flat ``[x0, y0, dx1, dy1, ...]`` steps of any SVG path, using svgelements."""
+  points = np.array([(seg.end.x, seg.end.y) for seg in svgelements.Path(path)
+      if seg.end is not None], dtype=np.float64)
+  steps = np.diff(points, axis=0, prepend=np.zeros((1, 2)))
+  return steps.ravel()
+
+
+def _text_(el):
+  """Text content of an element and its children, as ``PyQuery.text()``.
+
+  Each piece of text is stripped and the non-empty ones are joined by a space,
+  so ``<text><tspan>Name:</tspan><tspan>John</tspan></text>`` reads
+  ``Name: John``.
+  """
+  return ' '.join([t.strip() for t in el.itertext() if t.strip()])
+
+
+def _remove_(el):
+  """Remove an element from the tree, keeping the text that follows it."""
+  parent = el.getparent()
+  if parent is None:
+    return
+  if el.tail:
+    prev = el.getprevious()
+    if prev is None:
+      parent.text = (parent.text or '') + el.tail
+    else:
+      prev.tail = (prev.tail or '') + el.tail
+  parent.remove(el)
+
+
 @contextlib.contextmanager
 def supress(*exceptions):
   """Convenience method to catch exceptions implicitly."""
@@ -300,6 +629,22 @@ def supress(*exceptions):
 
 
 class Metadata(Parser):
+  def _text_nodes_(self):
+    """Yield ``(x, y, text)`` of the text nodes, see ``get_text_nodes``.
+
+    The text of the ``tspan`` children of a node is joined by spaces, as
+    ``PyQuery.text()`` does, see ``_text_``.
+    """
+    for el in self.svg[0].iter('text'):
+      try:
+        matrix = _TRANSFORM_RE.match(el.get('transform', '')).group(1)
+        # Only the translation, the last two of the six values, is converted.
+        _, x, y = matrix.rsplit(',', 2)
+        x, y = float(x), float(y)
+      except (AttributeError, ValueError):
+        x, y = 0, 0
+      yield x // 100, y // 100, _text_(el)
+
   def get_text_nodes(self):
     """Obtain the text nodes along with their coordinates.
 
@@ -309,20 +654,7 @@ class Metadata(Parser):
     By scaling these coordinates by a factor of ``1/100`` we can "clump
     together" nodes that are closer, hence easing the heuristic filtering later.
     """
-    def node_transform(el):
-      try:
-        transform_mat = ast.literal_eval(el.attr('transform')[6:])
-        x, y = list(transform_mat)[4:]
-      except (ValueError, SyntaxError):
-        x, y = 0, 0
-      text_content = el.text()
-      return [x // 100, y // 100, text_content]
-
-    nodes_paired = list(map(node_transform, (self.svg
-        .find('text')
-        .items())))
-
-    return pd.DataFrame(nodes_paired, columns=['x', 'y', 'text'])
+    return pd.DataFrame(list(self._text_nodes_()), columns=['x', 'y', 'text'])
 
   def infer_text(self):
     """Use heuristics to infer text nodes to structured data.
@@ -336,14 +668,19 @@ class Metadata(Parser):
     We use the ``x``, ``y`` coordinates to approximate decision tree that
     groups the data after applying several normalization as can be seen in code.
     """
-    text_nodes = self.get_text_nodes()
     meta = {}
 
-    top_row = (text_nodes
-        .query('y == 204')
-        .sort_values('x')
-        .text
-        .values)
+    # Index the nodes once by position, column and row, in document order.
+    at, by_x, by_y = {}, {}, {}
+    for x, y, text in self._text_nodes_():
+      at.setdefault((x, y), []).append(text)
+      by_x.setdefault(x, []).append((y, text))
+      by_y.setdefault(y, []).append((x, text))
+    # Text of ``(coordinate, text)`` pairs sorted by the coordinate.
+    ordered = lambda pairs, reverse=False: [text for _, text in
+        sorted(pairs, key=lambda pair: pair[0], reverse=reverse)]
+
+    top_row = ordered(by_y.get(204, []))
 
     with supress(IndexError):
       meta['Name'] = top_row[0]
@@ -351,50 +688,26 @@ class Metadata(Parser):
       meta['Date'] = top_row[2]
 
     with supress(IndexError):
-      meta['Sex'] = (text_nodes
-          .query('x == 4 and y == 194')
-          .text
-          .values[0])
+      meta['Sex'] = at.get((4, 194), [])[0]
     with supress(IndexError):
-      meta['Ethnicity'] = (text_nodes
-          .query('x == 19 and y == 194')
-          .text
-          .values[0])
+      meta['Ethnicity'] = at.get((19, 194), [])[0]
     with supress(IndexError):
-      meta['Weight'] = (text_nodes
-          .query('x == 19 and y == 191')
-          .text
-          .values[0])
+      meta['Weight'] = at.get((19, 191), [])[0]
     with supress(IndexError):
-      meta['Height'] = (text_nodes
-          .query('x == 4 and y == 191')
-          .text
-          .values[0])
+      meta['Height'] = at.get((4, 191), [])[0]
 
     with supress(TypeError):
-      meta['Remarks'] = '\n'.join((text_nodes
-          .query('x == 119')
-          .text
-          .values[:-1]))
+      meta['Remarks'] = '\n'.join([text for _, text in by_x.get(119, [])][:-1])
 
     with supress(IndexError):
-      eeg_report_keys = text_nodes.query('x == 54')
-      for row in eeg_report_keys.values:
-        y_coor = row[1]
-        rvalues = (text_nodes
-            .query('y == {0} and 50 < x < 110'.format(y_coor))
-            .sort_values('x')
-            .text
-            .values)
+      for y_coor, _ in by_x.get(54, []):
+        rvalues = ordered([(x, text) for x, text in by_y.get(y_coor, [])
+            if 50 < x < 110])
         key = rvalues[0]
         value = ' '.join(rvalues[1:])
         meta[key] = value
 
-    bottom_row = (text_nodes
-        .query('y == 11')
-        .sort_values('x')
-        .text
-        .values)
+    bottom_row = ordered(by_y.get(11, []))
 
     with supress(IndexError):
       meta['Scale_x'] = bottom_row[0]
@@ -404,27 +717,17 @@ class Metadata(Parser):
     split_and_strip = lambda x: [y.strip() for y in x.split(':')]
 
     with supress(ValueError):
-      meta.update(dict(map(split_and_strip, (text_nodes
-          .query('y == 162')
-          .sort_values('x')
-          .text
-          .values))))
+      meta.update(dict(map(split_and_strip, ordered(by_y.get(162, [])))))
 
     with supress(ValueError):
-      meta.update(dict(map(split_and_strip, (text_nodes
-          .query('x == 4 and 100 < y < 190')
-          .sort_values('y', ascending=False)
-          .text
-          .values))))
+      meta.update(dict(map(split_and_strip, ordered([(y, text)
+          for y, text in by_x.get(4, []) if 100 < y < 190], reverse=True))))
 
     with supress(ValueError):
-      meta.update(dict(map(split_and_strip, (text_nodes
-          .query('x == 32')
-          .sort_values('y', ascending=False)
-          .text
-          .values))))
+      meta.update(dict(map(split_and_strip, ordered(by_x.get(32, []),
+          reverse=True))))
 
-    normalise_key = lambda x: re.sub(r'[^\w\d\s\-_\\]+', '', x)
+    normalise_key = lambda x: _KEY_JUNK_RE.sub('', x)
     normal_meta = {normalise_key(k): v for k, v in meta.items()}
     return normal_meta
 
@@ -459,11 +762,12 @@ def build_stack(file_name, *arg, **kwa):
   assert 'ID' in meta, "Can't find `ID` in Metadata."
 
   logger.debug('----> Applying axial scaling')
-  factor_x, factor_y = [int(re.match(r'(\d+)', meta[f]).group(0))
+  factor_x, factor_y = [int(_SCALE_RE.match(meta[f]).group(0))
       for f in ['Scale_x', 'Scale_y']]
-  unit_x, unit_y = units
-  csv['actual_X'] = csv['absoluteX'] * (1 / factor_x) * unit_x
-  csv['actual_Y'] = csv['absoluteY'] * (1 / factor_y) * unit_y
+  # Python floats keep the single precision columns from being promoted.
+  unit_x, unit_y = map(float, units)
+  csv['actual_X'] = csv['absoluteX'] * (unit_x / factor_x)
+  csv['actual_Y'] = csv['absoluteY'] * (unit_y / factor_y)
 
   return csv, meta
 
@@ -488,4 +792,4 @@ def process_stack(file_name, out_path, *arg, **kwa):
     json.dump(meta, fl, indent=2)
 
 
-__all__ = ('Waveform', 'Metadata', 'process_stack')
+__all__ = ('Waveform', 'Metadata', 'BatchError', 'process_stack')
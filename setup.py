@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import ast
 import os
-import re
-import sys
 
 from codecs import open
 from setuptools import setup
@@ -12,22 +9,19 @@ here = os.path.abspath(os.path.dirname(__file__))
 with open(os.path.join(here, 'README.md'), 'r', encoding='utf-8') as fl:
   long_description = fl.read()
 
-with open(os.path.join(here, 'ekgstore', '__init__.py'), 'r') as fl:
-  version_str = re.search(r'__version_info__ = (.*)', fl.read(), re.M).group(1)
-  version = '.'.join(map(str, ast.literal_eval(version_str)))
+version_ns = {}
+with open(os.path.join(here, 'ekgstore', '_version.py'), 'r') as fl:
+  exec(fl.read(), version_ns)
+version = '.'.join(map(str, version_ns['__version_info__']))
 
 requires = [
   'click',
-  'glob2',
   'numpy',
   'pandas',
   'pyquery',
   'tqdm',
 ]
 
-if sys.version_info[0] < 3:
-  requires.append('subprocess32')
-
 setup(
   name='ekgstore',
   description='Parses and extracts metadata and waveforms from EKG files.',
@@ -36,7 +30,9 @@ setup(
   author='Prashant Sinha',
   author_email='prashant@ducic.ac.in',
   packages=['ekgstore'],
+  python_requires='>=3.7',
   install_requires=requires,
+  extras_require=dict(numba=['numba'], svgelements=['svgelements']),
   tests_require=[
     'nose',
   ],
@@ -0,0 +1,44 @@
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+
+# Stands in for `inkscape --shell`. It writes a small SVG for every command,
+# except for files named `*fail*`, and prints a bare `>` prompt after each.
+# It exits on files named `*crash*`.
+# With FAKE_INKSCAPE_HANG set, it never prints the first prompt.
+FAKE_INKSCAPE = '''#!{python}
+import os, shlex, sys, time
+if os.environ.get('FAKE_INKSCAPE_HANG'):
+  time.sleep(60)
+out = sys.stdout.buffer
+out.write(b"Inkscape interactive shell mode. Type 'quit' to quit.\\n>")
+out.flush()
+for line in sys.stdin:
+  args = dict(arg.split('=', 1) for arg in shlex.split(line) if '=' in arg)
+  if 'crash' in os.path.basename(args['--file']):
+    sys.exit(1)
+  if 'fail' not in os.path.basename(args['--file']):
+    with open(args['--export-plain-svg'], 'w') as fl:
+      fl.write('<svg xmlns="http://www.w3.org/2000/svg"><g><text>ok</text></g></svg>')
+  out.write(b'>')
+  out.flush()
+'''
+
+
+@contextlib.contextmanager
+def fake_inkscape():
+  """Put the fake ``inkscape`` first on the ``PATH``, and yield its directory."""
+  directory = tempfile.mkdtemp()
+  script = os.path.join(directory, 'inkscape')
+  with open(script, 'w') as fl:
+    fl.write(FAKE_INKSCAPE.format(python=sys.executable))
+  os.chmod(script, 0o755)
+  path = os.environ.get('PATH', '')
+  os.environ['PATH'] = directory + os.pathsep + path
+  try:
+    yield directory
+  finally:
+    os.environ['PATH'] = path
+    shutil.rmtree(directory)
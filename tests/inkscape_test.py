@@ -1,6 +1,9 @@
 import nose
+import os
 
-from ekgstore.inkscape import get_args, passthru
+from ekgstore.inkscape import get_args, passthru, InkscapeShell
+
+from . import fake_inkscape
 
 
 def test_args_one():
@@ -33,3 +36,68 @@ def test_timeouts():
     pass
   else:
     assert False, 'Timeout did not happen.'
+
+
+def test_shell_timeouts():
+  shell = InkscapeShell()
+  try:
+    shell.convert('/test.pdf', '/test.svg', timeout=1e-3)
+  except RuntimeError:
+    pass
+  else:
+    assert False, 'Timeout did not happen.'
+  finally:
+    shell.close()
+
+
+def test_shell_pipeline_empty():
+  shell = InkscapeShell()
+  assert list(shell.convert_many([], window=4)) == []
+  assert shell._proc is None
+
+
+def test_shell_prompt():
+  with fake_inkscape() as directory:
+    shell = InkscapeShell()
+    try:
+      destination = os.path.join(directory, 'test.svg')
+      shell.convert(os.path.join(directory, 'test.pdf'), destination, timeout=10)
+      assert os.path.exists(destination)
+      jobs = [(os.path.join(directory, name + '.pdf'), os.path.join(directory, name + '.svg'))
+          for name in ('one', 'fail', 'two')]
+      errors = [error for _, _, error in shell.convert_many(jobs, timeout=10)]
+      assert errors[0] is None and errors[2] is None
+      assert isinstance(errors[1], RuntimeError)
+    finally:
+      shell.close()
+
+
+def test_shell_spawn_timeout():
+  with fake_inkscape() as directory:
+    os.environ['FAKE_INKSCAPE_HANG'] = '1'
+    shell = InkscapeShell()
+    try:
+      shell.convert(os.path.join(directory, 'test.pdf'), '/test.svg', timeout=0.5)
+    except RuntimeError:
+      pass
+    else:
+      assert False, 'Timeout did not happen.'
+    finally:
+      del os.environ['FAKE_INKSCAPE_HANG']
+      shell.close()
+
+
+def test_shell_crash():
+  with fake_inkscape() as directory:
+    shell = InkscapeShell()
+    try:
+      jobs = [(os.path.join(directory, name + '.pdf'), os.path.join(directory, name + '.svg'))
+          for name in ('a', 'b', 'crash', 'c', 'd')]
+      errors = [error for _, _, error in shell.convert_many(jobs, timeout=10)]
+      assert [error is None for error in errors] == [True, True, False, True, True]
+      # The shell is spawned again after exiting between two conversions.
+      shell._proc.stdin.close()
+      shell._proc.wait()
+      shell.convert(*jobs[0], timeout=10)
+    finally:
+      shell.close()
@@ -1,19 +1,29 @@
 import nose
+import os
+import shutil
+import tempfile
 import numpy as np
 
-from ekgstore.parser import Waveform
+from lxml import etree
+from pyquery import PyQuery as pq
+
+from ekgstore.parser import BatchError, Metadata, Parser, Waveform, _parse_steps_, _text_
+
+from . import fake_inkscape
 
 
 class TestWaveform:
   test_path = 'm 100,100 10,10 10,-5 10,0 10,8'
+  # Same dtype as the offsets found by the parser, so they are used as is.
   test_offset = np.array([
     [50, 90],
     [50, 290],
     [50, 390],
-  ])
+  ], dtype=np.float64)
 
-  def __init__(self):
-    self.p = Waveform('.')
+  @classmethod
+  def setup_class(cls):
+    cls.p = Waveform('.')
 
   def test_path_as_waveform_(self):
     pairs = self.p._path_as_waveform_(self.test_path, self.test_offset)
@@ -33,3 +43,86 @@ class TestWaveform:
 
     assert all(np.equal(pairs[1], [160, 170, -30, -30, -22]))
 
+
+  def test_path_commands(self):
+    try:
+      import svgelements
+    except ImportError:
+      raise nose.SkipTest('svgelements is not installed.')
+    test_path = 'M 100,100 110,110 h 10 l 0,-5 10,0 v 8'
+    pairs = self.p._path_as_waveform_(test_path, self.test_offset)
+
+    assert all(np.equal(pairs[0], [50, 60, 70, 70, 80, 80]))
+    assert all(np.equal(pairs[1], [10, 20, 20, 15, 15, 23]))
+
+
+def test_parse_steps():
+  test_path = ' 12.5,-3 1e2,-.5 +4.25E-1,0'
+  steps = _parse_steps_(np.frombuffer(test_path.encode(), dtype=np.uint8))
+
+  assert np.allclose(steps, [12.5, -3, 100, -0.5, 0.425, 0])
+
+
+def test_text_tspans():
+  el = etree.fromstring('<text> <tspan>Name:</tspan><tspan>John  Doe </tspan>\n</text>')
+
+  assert _text_(el) == 'Name: John  Doe'
+
+
+def test_metadata_text_nodes():
+  m = Metadata('.')
+  m._svg = pq(etree.fromstring(
+      '<svg><text transform="matrix(1,0,0,-1,250,1250)">'
+      '<tspan>ID:</tspan><tspan>011489879</tspan></text></svg>'))
+
+  assert list(m._text_nodes_()) == [(2, 12, 'ID: 011489879')]
+
+
+class Labels(Parser):
+  def export(self):
+    return _text_(self.svg[0])
+
+
+def test_process_batch_failure():
+  cache_home = os.environ.get('XDG_CACHE_HOME')
+  with fake_inkscape() as directory:
+    try:
+      names = ('one', 'fail', 'missing', 'text', 'crash', 'two')
+      flnames = [os.path.join(directory, name + '.pdf') for name in names]
+      for name, flname in zip(names, flnames):
+        if name != 'missing':
+          with open(flname, 'w') as fl:
+            fl.write(name if name == 'text' else '%PDF-' + name)
+      for workers in (1, 2):
+        # Each run converts the files anew.
+        os.environ['XDG_CACHE_HOME'] = os.path.join(directory, str(workers))
+        try:
+          Labels.process_many(flnames, workers=workers, timeout=10)
+        except BatchError as exc:
+          assert sorted(exc.errors) == sorted(flnames[1:5])
+          assert exc.results == ['ok', None, None, None, None, 'ok']
+        else:
+          assert False, 'Expected BatchError'
+    finally:
+      if cache_home is None:
+        del os.environ['XDG_CACHE_HOME']
+      else:
+        os.environ['XDG_CACHE_HOME'] = cache_home
+
+
+def test_svg_path_whole_file():
+  cache_home = os.environ.get('XDG_CACHE_HOME')
+  directory = tempfile.mkdtemp()
+  os.environ['XDG_CACHE_HOME'] = directory
+  try:
+    flnames = [os.path.join(directory, name) for name in ('a.pdf', 'b.pdf')]
+    for flname, middle in zip(flnames, (b'a', b'b')):
+      with open(flname, 'wb') as fl:
+        fl.write(b'x' * (1 << 17) + middle + b'x' * (1 << 17))
+    assert Parser._svg_path_(flnames[0]) != Parser._svg_path_(flnames[1])
+  finally:
+    if cache_home is None:
+      del os.environ['XDG_CACHE_HOME']
+    else:
+      os.environ['XDG_CACHE_HOME'] = cache_home
+    shutil.rmtree(directory)